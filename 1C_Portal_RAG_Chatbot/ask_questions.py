@@ -89,7 +89,7 @@ def search_similar_chunks(question, index, chunks, metadata, top_k=TOP_K_RESULTS
         # Prepare results
         relevant_chunks = []
         for score, idx in zip(scores[0], index[0]):
-            if idx < len(chunks):
+            if 0 <= idx < len(chunks): # approximate indexes pad with -1
                 relevant_chunks.append({
                     'text': chunks[idx],
                     'page_number': metadata[idx]['page_number'],
@@ -103,6 +103,62 @@ def search_similar_chunks(question, index, chunks, metadata, top_k=TOP_K_RESULTS
         print(f"❌ Error searching chunks: {str(e)}")
         return []
 
+def build_context(relevant_chunks, score_threshold=SIMILARITY_THRESHOLD):
+    """
+    Build the prompt context from retrieved chunks
+
+    Args:
+        relevant_chunks: List of relevant chunks with metadata
+        score_threshold: Minimum similarity score for a chunk to be included
+
+    Returns:
+        context: Context string ('' if no chunk passed the threshold)
+        source_pages: Set of page numbers used in the context
+    """
+    context_parts = []
+    source_pages = set()
+
+    for chunk_info in relevant_chunks:
+        page_num = chunk_info['page_number']
+        chunk_text = chunk_info['text']
+        score = chunk_info['similarity_score']
+
+        # Only include chunks with reasonable similarity
+        if score > score_threshold:
+            context_parts.append(f"[Page {page_num}] :\n{chunk_text}]")
+            source_pages.add(page_num)
+
+    context = '\n\n---\n\n'.join(context_parts)
+
+    return context, source_pages
+
+
+def build_messages(question, context, total_pages):
+    """
+    Build the chat messages sent to GPT
+
+    Args:
+        question: User's question
+        context: Context string from build_context
+        total_pages: Total pages in document
+
+    Returns:
+        messages: List of chat messages
+    """
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": f"""Document Context (from 1C Portal Support Guide - {total_pages} pages total): {context}
+                    User Question: {question}
+                    Please provide a detailed answer based on the context above. Include specific steps if the question is about a process. Mention relevant page numbers when providing information."""
+        }
+    ]
+
+
 def generate_answer(question, relevant_chunks, total_pages):
     """
     Generate answer using GPT with relevant context
@@ -119,39 +175,15 @@ def generate_answer(question, relevant_chunks, total_pages):
 
     try:
         # Build context from relevant chunks
-        context_parts = []
-        source_pages = set()
-
-        for chunk_info in relevant_chunks:
-            page_num = chunk_info['page_number']
-            chunk_text = chunk_info['text']
-            score = chunk_info['similarity_score']
-
-            # Only include chunks with reasonable similarity
-            if score > 0.5: # Threshold for relevance
-                context_parts.append(f"[Page {page_num}] :\n{chunk_text}]")
-                source_pages.add(page_num)
+        context, source_pages = build_context(relevant_chunks)
 
-        if not context_parts:
+        if not context:
             return "I couldn't find relevant information in the 1C Portal Support Guide to answer this question. Please try rephrasing or ask about topics covered in the guide (Timesheets, Leave Management, Expense Claims, Project Assignments, etc.).", []
 
-        context = '\n\n---\n\n'.join(context_parts)
-
         # Generate answer using GPT
         response = openai.ChatCompletion.create(
             model = CHAT_MODEL,
-            messages = [
-                {
-                    "role": "system",
-                    "content": SYSTEM_PROMPT
-                },
-                {
-                    "role": "user",
-                    "content": f"""Document Context (from 1C Portal Support Guide - {total_pages} pages total): {context}
-                    User Question: {question}
-                    Please provide a detailed answer based on the context above. Include specific steps if the question is about a process. Mention relevant page numbers when providing information."""
-                }
-            ],
+            messages = build_messages(question, context, total_pages),
             temperature = 0.7,
             max_tokens = 800
         )
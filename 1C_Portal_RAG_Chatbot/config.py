@@ -13,13 +13,36 @@ OPENAI_API_KEY = "Paste your OPENAI Key here"
 PDF_PATH = "data/1C_Portal_Support_Guide_v3.2.pdf"
 VECTOR_INDEX_PATH = "vector_db/vector.index"
 CHUNKS_PKL_PATH = "vector_db/chunks.pkl"
+EMBEDDINGS_PATH = "vector_db/embeddings.f32" # Raw float32 matrix, deleted once the index is built
+IVF_DATA_PATH = "vector_db/vector.ivfdata" # Inverted lists when INDEX_TYPE is "ivf_ondisk"
 
 # RAG parameters
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 100
 EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBEDDING_DIMENSION = 1536
 CHAT_MODEL = "gpt-4o-mini"
 TOP_K_RESULTS = 5 #Number of relevant chunks to retrieve
+SIMILARITY_THRESHOLD = 0.5 # Minimum score for a chunk to be used as context
+INDEX_TYPE = "flat" # "flat" (exact), "hnsw", "ivf" or "ivf_ondisk" (approximate)
+IVF_NPROBE = 8 # Inverted lists scanned per query for the IVF index types
+HNSW_M = 32 # Graph neighbours per node when INDEX_TYPE is "hnsw"
+
+# Streaming build (bounded memory)
+EMBEDDING_BATCH_SIZE = 100 # Chunks per embedding API call
+INDEX_ADD_BATCH_SIZE = 10000 # Vectors added to the index at a time
+IVF_TRAIN_SAMPLE = 40000 # Max vectors used to train IVF centroids
+
+# Retrieval evaluation (evaluate_retrieval.py)
+EVAL_QUESTIONS_PATH = "data/eval_questions.json"
+EVAL_REPORT_PATH = "vector_db/retrieval_eval_report.json"
+EMBEDDING_CACHE_PATH = "vector_db/embedding_cache.pkl"
+EVAL_CHUNK_SIZES = [300, 500, 800]
+EVAL_CHUNK_OVERLAPS = [50, 100]
+EVAL_TOP_K_VALUES = [3, 5, 8]
+EVAL_SCORE_THRESHOLDS = [0.0, 0.5, 0.7]
+EVAL_INDEX_TYPES = ["flat", "hnsw", "ivf"]
+EVAL_MIN_RECALL = 0.8 # Quality bar used to pick the cheapest configuration
 
 # System Prompt
 SYSTEM_PROMPT = """You are an AI assistant specialized in helping Cognizant employees with 1C Portal queries.
@@ -0,0 +1,358 @@
+"""
+Retrieval Evaluation
+Sweeps chunking, top-k, score threshold and index type over a labelled
+question set and reports retrieval quality next to its cost
+Run after editing data/eval_questions.json to compare configurations
+"""
+import faiss
+import openai
+import PyPDF2
+import numpy as np
+import hashlib
+import itertools
+import json
+import pickle
+import os
+import sys
+import time
+from config import *
+from pdf_to_vectors import extract_page_texts, create_chunks, build_index
+from ask_questions import build_context, build_messages
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Set OpenAI API key
+openai.api_key = OPENAI_API_KEY
+
+LATENCY_REPEATS = 5 # Searches per question when timing an index
+
+
+def load_eval_questions(questions_path):
+    """
+    Load the labelled question set
+
+    Args:
+        questions_path: Path to a JSON list of
+            {"question": ..., "expected_pages": [...]} entries
+
+    Returns:
+        questions: list of question dicts
+    """
+    with open(questions_path, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+
+    for item in questions:
+        if not item.get('question') or not item.get('expected_pages'):
+            raise ValueError(f"Question entry needs 'question' and 'expected_pages': {item}")
+
+    return questions
+
+
+def load_embedding_cache(cache_path=EMBEDDING_CACHE_PATH):
+    """Load cached embeddings keyed by model and text hash"""
+    if not os.path.exists(cache_path):
+        return {}
+
+    with open(cache_path, 'rb') as f:
+        return pickle.load(f)
+
+
+def save_embedding_cache(cache, cache_path=EMBEDDING_CACHE_PATH):
+    """Save cached embeddings to disk"""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    with open(cache_path, 'wb') as f:
+        pickle.dump(cache, f)
+
+
+def _cache_key(text):
+    return f"{EMBEDDING_MODEL}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+
+def embed_texts(texts, cache):
+    """
+    Embed texts, calling OpenAI only for texts not already in the cache
+
+    Args:
+        texts: list of strings
+        cache: dict updated in place with new embeddings
+
+    Returns:
+        embeddings_array: L2-normalized float32 array of shape (len(texts), dim)
+        failed_embeddings: number of texts left as zero vectors
+    """
+    missing = list({_cache_key(t): t for t in texts if _cache_key(t) not in cache}.items())
+
+    if missing:
+        print(f"   Embedding {len(missing)} new texts ({len(texts) - len(missing)} cached)...")
+
+    for start in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+        batch = missing[start:start + EMBEDDING_BATCH_SIZE]
+        try:
+            response = openai.Embedding.create(
+                input=[text for _, text in batch],
+                model=EMBEDDING_MODEL
+            )
+            for item in response['data']:
+                key = batch[item['index']][0]
+                cache[key] = np.array(item['embedding'], dtype='float32')
+
+        except Exception as e:
+            # Failed texts stay uncached and are retried on the next run
+            print(f"\n⚠️  Warning: Failed to embed batch starting at {start + 1}: {str(e)}")
+
+    embeddings_array = np.zeros((len(texts), EMBEDDING_DIMENSION), dtype='float32')
+    failed_embeddings = 0
+    for i, text in enumerate(texts):
+        embedding = cache.get(_cache_key(text))
+        if embedding is not None:
+            embeddings_array[i] = embedding
+        else:
+            failed_embeddings += 1
+
+    faiss.normalize_L2(embeddings_array)
+    return embeddings_array, failed_embeddings
+
+
+def count_tokens(text):
+    """Count prompt tokens with tiktoken, or estimate at ~4 chars/token"""
+    if tiktoken is None:
+        return len(text) // 4
+
+    try:
+        encoding = tiktoken.encoding_for_model(CHAT_MODEL)
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+
+    return len(encoding.encode(text))
+
+
+def index_size_bytes(index):
+    """Size of the index as written to disk"""
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def time_searches(index, query_vectors, top_k):
+    """
+    Search each question separately, as the chatbot does
+
+    Returns:
+        scores, ids: search results for all questions
+        latencies_ms: per-search latencies in milliseconds
+    """
+    latencies_ms = []
+    for _ in range(LATENCY_REPEATS):
+        for i in range(len(query_vectors)):
+            start = time.perf_counter()
+            index.search(query_vectors[i:i + 1], top_k)
+            latencies_ms.append((time.perf_counter() - start) * 1000)
+
+    scores, ids = index.search(query_vectors, top_k)
+    return scores, ids, latencies_ms
+
+
+def score_question(expected_pages, relevant_chunks, question, score_threshold, total_pages):
+    """
+    Score one question's retrieved chunks
+
+    Returns:
+        recall: share of expected pages present in the prompt context
+        reciprocal_rank: 1 / rank of the first chunk from an expected page
+        prompt_tokens: tokens sent to GPT (0 if nothing passes the threshold)
+    """
+    kept = [c for c in relevant_chunks if c['similarity_score'] > score_threshold]
+    expected = set(expected_pages)
+
+    retrieved_pages = {c['page_number'] for c in kept}
+    recall = len(expected & retrieved_pages) / len(expected)
+
+    reciprocal_rank = 0.0
+    for rank, chunk_info in enumerate(kept, 1):
+        if chunk_info['page_number'] in expected:
+            reciprocal_rank = 1.0 / rank
+            break
+
+    context, _ = build_context(relevant_chunks, score_threshold)
+    if not context:
+        prompt_tokens = 0
+    else:
+        messages = build_messages(question, context, total_pages)
+        prompt_tokens = sum(count_tokens(m['content']) for m in messages)
+
+    return recall, reciprocal_rank, prompt_tokens
+
+
+def evaluate_retrieval(pdf_path=PDF_PATH, questions_path=EVAL_QUESTIONS_PATH):
+    """
+    Sweep the evaluation grid from config.py
+
+    Args:
+        pdf_path: Path to the PDF file
+        questions_path: Path to the labelled question set
+
+    Returns:
+        results: list of per-configuration result dicts, or None if the
+            questions could not be embedded
+    """
+    print("="*70)
+    print("📏 1C PORTAL RAG SYSTEM - RETRIEVAL EVALUATION")
+    print("="*70)
+
+    questions = load_eval_questions(questions_path)
+    print(f"\n❓ Loaded {len(questions)} labelled questions from {questions_path}")
+
+    with open(pdf_path, "rb") as f:
+        pdf_reader = PyPDF2.PdfReader(f)
+        total_pages = len(pdf_reader.pages)
+        page_texts = extract_page_texts(pdf_reader)
+    print(f"\n📄 Read {total_pages} pages from {pdf_path}")
+
+    cache = load_embedding_cache()
+    query_vectors, failed_questions = embed_texts([q['question'] for q in questions], cache)
+    save_embedding_cache(cache)
+
+    # A zero query vector would score 0 recall in every configuration
+    if failed_questions > 0:
+        print(f"❌ ERROR: {failed_questions} questions failed to embed, aborting the sweep")
+        return None
+
+    results = []
+
+    for chunk_size, chunk_overlap in itertools.product(EVAL_CHUNK_SIZES, EVAL_CHUNK_OVERLAPS):
+        if chunk_overlap >= chunk_size:
+            continue
+
+        print(f"\n🔄 Chunking: size={chunk_size}, overlap={chunk_overlap}")
+        chunks, chunk_metadata = create_chunks(page_texts, chunk_size, chunk_overlap)
+        embeddings_array, failed_embeddings = embed_texts(chunks, cache)
+        save_embedding_cache(cache)
+
+        if failed_embeddings > 0:
+            print(f"⚠️  {failed_embeddings} chunks failed to embed, results for this chunking are partial")
+
+        for index_type in EVAL_INDEX_TYPES:
+            start = time.perf_counter()
+            index = build_index(embeddings_array, index_type)
+            build_seconds = time.perf_counter() - start
+            size_bytes = index_size_bytes(index)
+
+            for top_k in EVAL_TOP_K_VALUES:
+                scores, ids, latencies_ms = time_searches(index, query_vectors, top_k)
+
+                retrieved = []
+                for row_scores, row_ids in zip(scores, ids):
+                    retrieved.append([
+                        {
+                            'text': chunks[idx],
+                            'page_number': chunk_metadata[idx]['page_number'],
+                            'similarity_score': float(score),
+                        }
+                        for score, idx in zip(row_scores, row_ids)
+                        if 0 <= idx < len(chunks)
+                    ])
+
+                for score_threshold in EVAL_SCORE_THRESHOLDS:
+                    scored = [
+                        score_question(q['expected_pages'], relevant_chunks, q['question'],
+                                       score_threshold, total_pages)
+                        for q, relevant_chunks in zip(questions, retrieved)
+                    ]
+                    recalls, reciprocal_ranks, prompt_tokens = zip(*scored)
+
+                    results.append({
+                        'chunk_size': chunk_size,
+                        'chunk_overlap': chunk_overlap,
+                        'index_type': index_type,
+                        'top_k': top_k,
+                        'score_threshold': score_threshold,
+                        'num_chunks': len(chunks),
+                        'failed_embeddings': failed_embeddings,
+                        'recall_at_k': float(np.mean(recalls)),
+                        'mrr': float(np.mean(reciprocal_ranks)),
+                        'search_latency_ms_mean': float(np.mean(latencies_ms)),
+                        'search_latency_ms_p95': float(np.percentile(latencies_ms, 95)),
+                        'index_build_seconds': build_seconds,
+                        'index_size_bytes': size_bytes,
+                        'prompt_tokens_mean': float(np.mean(prompt_tokens)),
+                        'prompt_tokens_max': int(max(prompt_tokens)),
+                    })
+
+            print(f"   ✅ {index_type}: {index.ntotal} vectors, {size_bytes / 1024:.1f} KB")
+
+    return results
+
+
+def pick_cheapest(results, min_recall=EVAL_MIN_RECALL):
+    """
+    Pick the cheapest configuration meeting the recall bar
+
+    Cost is compared by prompt tokens first (the dominant per-query cost),
+    then search latency, then index size. Results with failed chunk
+    embeddings are never picked.
+
+    Returns:
+        result: chosen result dict, or None if nothing meets the bar
+    """
+    candidates = [r for r in results
+                  if r['failed_embeddings'] == 0 and r['recall_at_k'] >= min_recall]
+    if not candidates:
+        return None
+
+    return min(candidates, key=lambda r: (
+        r['prompt_tokens_mean'], r['search_latency_ms_mean'], r['index_size_bytes']))
+
+
+def save_report(results, report_path=EVAL_REPORT_PATH):
+    """Write the evaluation results and recommendation as JSON"""
+    report = {
+        'embedding_model': EMBEDDING_MODEL,
+        'chat_model': CHAT_MODEL,
+        'token_counter': 'tiktoken' if tiktoken is not None else 'estimate (chars / 4)',
+        'min_recall': EVAL_MIN_RECALL,
+        'partial_results': sum(1 for r in results if r['failed_embeddings'] > 0),
+        'recommended': pick_cheapest(results),
+        'results': results,
+    }
+
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    return report
+
+
+if __name__ == "__main__":
+    results = evaluate_retrieval()
+
+    if results is None:
+        print("\n❌ Evaluation failed. Please check the errors above.")
+        sys.exit(1)
+
+    report = save_report(results)
+
+    print("\n" + "=" * 70)
+    print(f"{'size':>5} {'ovl':>4} {'index':>6} {'k':>3} {'thr':>4} "
+          f"{'recall':>7} {'mrr':>6} {'ms':>7} {'KB':>8} {'tokens':>7} {'failed':>6}")
+    for r in results:
+        print(f"{r['chunk_size']:>5} {r['chunk_overlap']:>4} {r['index_type']:>6} "
+              f"{r['top_k']:>3} {r['score_threshold']:>4} {r['recall_at_k']:>7.3f} "
+              f"{r['mrr']:>6.3f} {r['search_latency_ms_mean']:>7.3f} "
+              f"{r['index_size_bytes'] / 1024:>8.1f} {r['prompt_tokens_mean']:>7.0f} "
+              f"{r['failed_embeddings']:>6}")
+
+    print("=" * 70)
+    if report['partial_results']:
+        print(f"⚠️  {report['partial_results']} configurations had failed embeddings and were not considered")
+    recommended = report['recommended']
+    if recommended:
+        print(f"🏆 Cheapest configuration with recall@k >= {EVAL_MIN_RECALL}:")
+        print(f"   CHUNK_SIZE = {recommended['chunk_size']}")
+        print(f"   CHUNK_OVERLAP = {recommended['chunk_overlap']}")
+        print(f"   TOP_K_RESULTS = {recommended['top_k']}")
+        print(f"   SIMILARITY_THRESHOLD = {recommended['score_threshold']}")
+        print(f"   INDEX_TYPE = \"{recommended['index_type']}\"")
+    else:
+        print(f"⚠️  No configuration reached recall@k >= {EVAL_MIN_RECALL} without failed embeddings")
+    print(f"💾 Report saved: {EVAL_REPORT_PATH}")
@@ -2,6 +2,10 @@
 PDF to Vector Database Converter
 This script converts the 1C Portal Support Guide PDF into a searchable vector database
 Run this ONCE to create the vector database
+
+The build streams pages -> chunks -> embedding batches into a raw float32
+file, then adds the vectors to the index in blocks, so embeddings are never
+all held in memory at once
 """
 import faiss
 import openai
@@ -9,11 +13,402 @@ import PyPDF2
 import numpy as np
 import pickle
 import os
+import shutil
+import sys
+import tempfile
+import threading
+from faiss.contrib.ondisk import merge_ondisk
 from config import *
 
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
 # Set OpenAI API key
 openai.api_key = OPENAI_API_KEY
 
+
+def iter_page_texts(pdf_reader):
+    """
+    Yield the text of each page of an open PDF, one page at a time
+
+    Args:
+        pdf_reader: PyPDF2.PdfReader for the document
+
+    Yields:
+        page_info: dict with 'text' and 'page_number'
+    """
+    total_pages = len(pdf_reader.pages)
+    for page_num, page in enumerate(pdf_reader.pages):
+        print(f"   Reading page {page_num + 1}/{total_pages}...", end='\r')
+        yield {
+            "text": page.extract_text(),
+            "page_number": page_num + 1
+        }
+
+
+def extract_page_texts(pdf_reader):
+    """
+    Extract text from each page of an open PDF
+
+    Args:
+        pdf_reader: PyPDF2.PdfReader for the document
+
+    Returns:
+        page_texts: list of dicts with 'text' and 'page_number'
+    """
+    return list(iter_page_texts(pdf_reader))
+
+
+def iter_chunks(page_texts, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Yield overlapping chunks from an iterable of pages
+
+    Args:
+        page_texts: iterable of dicts with 'text' and 'page_number'
+        chunk_size: characters per chunk
+        chunk_overlap: characters shared by consecutive chunks
+
+    Yields:
+        chunk_text, metadata: chunk string and its metadata dict
+    """
+    chunk_count = 0
+
+    # Smart chunking: preserve paragraphs when possible
+    for page_info in page_texts:
+        page_text = page_info['text']
+        page_num = page_info['page_number']
+
+        # Split page into chunks
+        for i in range(0,len(page_text),chunk_size - chunk_overlap):
+            chunk_text = page_text[i:i+chunk_size]
+
+
+            if len(chunk_text.strip()) > 50:  # Skip very small chunks
+                yield chunk_text, {
+                    'page_number': page_num,
+                    'chunk_index': chunk_count,
+                    'char_start': i,
+                    'char_end': i + len(chunk_text)
+                }
+                chunk_count += 1
+
+
+def create_chunks(page_texts, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Split page texts into overlapping chunks
+
+    Args:
+        page_texts: list of dicts with 'text' and 'page_number'
+        chunk_size: characters per chunk
+        chunk_overlap: characters shared by consecutive chunks
+
+    Returns:
+        chunks: list of text chunks
+        chunk_metadata: list of metadata dicts, one per chunk
+    """
+    chunks = []
+    chunk_metadata = []
+    for chunk_text, metadata in iter_chunks(page_texts, chunk_size, chunk_overlap):
+        chunks.append(chunk_text)
+        chunk_metadata.append(metadata)
+
+    return chunks, chunk_metadata
+
+
+def iter_batches(items, batch_size):
+    """Yield lists of up to batch_size items from an iterable"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def embed_batch(texts):
+    """
+    Embed a batch of texts with one OpenAI call
+
+    Falls back to one call per text if the batch call fails, so only
+    the chunks that really fail get a zero vector.
+
+    Args:
+        texts: list of strings
+
+    Returns:
+        embeddings_batch: float32 array of shape (len(texts), EMBEDDING_DIMENSION)
+        failed_chunks: number of texts left as zero vectors
+    """
+    embeddings_batch = np.zeros((len(texts), EMBEDDING_DIMENSION), dtype='float32')
+    failed_chunks = 0
+
+    try:
+        response = openai.Embedding.create(
+            input=texts,
+            model=EMBEDDING_MODEL
+        )
+        for item in response['data']:
+            embeddings_batch[item['index']] = item['embedding']
+
+    except Exception as e:
+        print(f"\n⚠️  Warning: Batch embedding failed, retrying one by one: {str(e)}")
+
+        for i, text in enumerate(texts):
+            try:
+                response = openai.Embedding.create(
+                    input=text,
+                    model=EMBEDDING_MODEL
+                )
+                embeddings_batch[i] = response['data'][0]['embedding']
+
+            except Exception as e:
+                print(f"\n⚠️  Warning: Failed to embed chunk: {str(e)}")
+                failed_chunks += 1
+                # Zero vector stays as placeholder
+
+    return embeddings_batch, failed_chunks
+
+
+def stream_embeddings_to_disk(chunk_iter, embeddings_path=EMBEDDINGS_PATH):
+    """
+    Embed chunks batch by batch, appending normalized float32 rows to a file
+
+    Only one batch of embeddings is held in memory at a time.
+
+    Args:
+        chunk_iter: iterable of (chunk_text, metadata) pairs
+        embeddings_path: raw float32 output file, overwritten
+
+    Returns:
+        chunks: list of text chunks
+        chunk_metadata: list of metadata dicts, one per chunk
+        failed_chunks: number of chunks stored as zero vectors
+    """
+    chunks = []
+    chunk_metadata = []
+    failed_chunks = 0
+
+    os.makedirs(os.path.dirname(embeddings_path), exist_ok=True)
+
+    with open(embeddings_path, "wb") as f:
+        for batch in iter_batches(chunk_iter, EMBEDDING_BATCH_SIZE):
+            texts = [chunk_text for chunk_text, _ in batch]
+
+            embeddings_batch, batch_failed = embed_batch(texts)
+
+            # Normalize vectors for better similarity search
+            faiss.normalize_L2(embeddings_batch)
+            embeddings_batch.tofile(f)
+
+            chunks.extend(texts)
+            chunk_metadata.extend(metadata for _, metadata in batch)
+            failed_chunks += batch_failed
+
+            print(f"   Embedded {len(chunks)} chunks...", end='\r')
+
+    return chunks, chunk_metadata, failed_chunks
+
+
+def _embeddings_shape(embeddings):
+    """(rows, dimension) of an array, or of a raw float32 embeddings file"""
+    if not isinstance(embeddings, (str, os.PathLike)):
+        return embeddings.shape
+
+    row_bytes = EMBEDDING_DIMENSION * np.dtype('float32').itemsize
+    file_size = os.path.getsize(embeddings)
+    if file_size % row_bytes:
+        raise ValueError(f"{embeddings} is not a float32 file of {EMBEDDING_DIMENSION}-dimension rows")
+
+    return file_size // row_bytes, EMBEDDING_DIMENSION
+
+
+def _iter_blocks(embeddings):
+    """
+    Yield (start, block) slices of INDEX_ADD_BATCH_SIZE rows, copied into memory
+
+    Embeddings files are read with plain file reads rather than mapped, so
+    rows already added to the index do not stay resident.
+    """
+    total, dimension = _embeddings_shape(embeddings)
+
+    if not isinstance(embeddings, (str, os.PathLike)):
+        for start in range(0, total, INDEX_ADD_BATCH_SIZE):
+            yield start, np.ascontiguousarray(embeddings[start:start + INDEX_ADD_BATCH_SIZE], dtype='float32')
+        return
+
+    with open(embeddings, "rb") as f:
+        for start in range(0, total, INDEX_ADD_BATCH_SIZE):
+            rows = min(INDEX_ADD_BATCH_SIZE, total - start)
+            block = np.fromfile(f, dtype='float32', count=rows * dimension)
+            yield start, block.reshape(rows, dimension)
+
+
+def _training_sample(embeddings):
+    """Draw roughly IVF_TRAIN_SAMPLE random rows, one block at a time, for IVF training"""
+    total, _ = _embeddings_shape(embeddings)
+    if total <= IVF_TRAIN_SAMPLE:
+        return np.vstack([block for _, block in _iter_blocks(embeddings)])
+
+    rng = np.random.default_rng(0)
+    keep_fraction = IVF_TRAIN_SAMPLE / total
+    sample = [block[rng.random(len(block)) < keep_fraction] for _, block in _iter_blocks(embeddings)]
+    return np.vstack(sample)
+
+
+def _trained_ivf_index(embeddings):
+    """Create an IVF index with roughly sqrt(n) lists, trained on a sample"""
+    total, dimension = _embeddings_shape(embeddings)
+    nlist = max(1, int(np.sqrt(total)))
+
+    quantizer = faiss.IndexFlatIP(dimension)
+    index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+    index.train(_training_sample(embeddings))
+    index.nprobe = min(IVF_NPROBE, nlist)
+    return index
+
+
+def build_ondisk_ivf_index(embeddings, ivfdata_path=IVF_DATA_PATH):
+    """
+    Build an IVF index whose inverted lists live in a file on disk
+
+    Each block is added to its own copy of the trained index and written out,
+    then the blocks are merged into ivfdata_path, so RAM only ever holds the
+    centroids and one block of vectors.
+
+    Args:
+        embeddings: float32 array of shape (n, dim), or path to a raw float32
+            file written by stream_embeddings_to_disk; L2-normalized
+        ivfdata_path: file that receives the inverted lists
+
+    Returns:
+        index: IVF index backed by ivfdata_path
+    """
+    index = _trained_ivf_index(embeddings)
+
+    block_dir = tempfile.mkdtemp(dir=os.path.dirname(ivfdata_path) or ".")
+    try:
+        block_paths = []
+        for start, block in _iter_blocks(embeddings):
+            block_index = faiss.clone_index(index)
+            block_index.add_with_ids(block, np.arange(start, start + len(block), dtype='int64'))
+
+            block_path = os.path.join(block_dir, f"block_{len(block_paths)}.index")
+            faiss.write_index(block_index, block_path)
+            block_paths.append(block_path)
+            del block_index
+
+        if os.path.exists(ivfdata_path):
+            os.remove(ivfdata_path)
+        merge_ondisk(index, block_paths, ivfdata_path)
+
+    finally:
+        shutil.rmtree(block_dir, ignore_errors=True)
+
+    return index
+
+
+def build_index(embeddings, index_type=INDEX_TYPE):
+    """
+    Build a FAISS inner-product index over normalized embeddings
+
+    Vectors are added in blocks of INDEX_ADD_BATCH_SIZE, so an embeddings
+    file is never loaded into RAM as a whole.
+
+    Args:
+        embeddings: float32 array of shape (n, dim), or path to a raw float32
+            file written by stream_embeddings_to_disk; L2-normalized
+        index_type: "flat" (exact), "hnsw", "ivf" or "ivf_ondisk" (approximate)
+
+    Returns:
+        index: populated FAISS index
+    """
+    _, dimension = _embeddings_shape(embeddings)
+
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dimension)
+
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+
+    elif index_type == "ivf":
+        index = _trained_ivf_index(embeddings)
+
+    elif index_type == "ivf_ondisk":
+        return build_ondisk_ivf_index(embeddings)
+
+    else:
+        raise ValueError(f"Unknown index type: {index_type}")
+
+    for _, block in _iter_blocks(embeddings):
+        index.add(block)
+
+    return index
+
+
+def peak_memory_mb():
+    """
+    Peak resident memory of this process in MB, or None if unavailable
+
+    This counts mapped file pages too, such as vector.ivfdata while
+    "ivf_ondisk" lists are merged.
+    """
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _anon_memory_kb():
+    """Current anonymous (heap) resident memory in KB, or None if unavailable"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("RssAnon:"):
+                    return int(line.split()[1])
+    except OSError:  # Not Linux
+        pass
+
+    return None
+
+
+def track_peak_anon_memory(interval=0.05):
+    """
+    Sample anonymous memory in a background thread
+
+    Unlike peak_memory_mb, this leaves out page cache from mapped files,
+    so it shows what the build itself holds in RAM.
+
+    Returns:
+        stop: function that stops sampling and returns the peak in MB,
+            or None if RssAnon is unavailable
+    """
+    peak_kb = [_anon_memory_kb()]
+    done = threading.Event()
+
+    def sample():
+        while peak_kb[0] is not None and not done.wait(interval):
+            peak_kb[0] = max(peak_kb[0], _anon_memory_kb() or 0)
+
+    thread = threading.Thread(target=sample, daemon=True)
+    thread.start()
+
+    def stop():
+        done.set()
+        thread.join()
+        if peak_kb[0] is None:
+            return None
+        return max(peak_kb[0], _anon_memory_kb() or 0) / 1024
+
+    return stop
+
+
 def pdf_to_vectors(pdf_path):
     """
         Convert PDF to vector embeddings and save to FAISS index
@@ -22,7 +417,7 @@ def pdf_to_vectors(pdf_path):
             pdf_path: Path to the PDF file
 
         Returns:
-            embeddings: numpy array of embeddings
+            index: populated FAISS index
             chunks: list of text chunks
         """
     print("="*70)
@@ -35,102 +430,65 @@ def pdf_to_vectors(pdf_path):
         print("📁 Please place your PDF in the 'data' folder")
         return None, None
 
-    # Read PDF
+    # Read PDF, chunk and embed page by page
     print(f"\n📄 Reading PDF: {pdf_path}")
+    print(f"🔄 Generating embeddings using OpenAI ({EMBEDDING_MODEL}), {EMBEDDING_BATCH_SIZE} chunks per call...")
+    print("⏳ This may take a few minutes...")
+
+    stop_memory_tracking = track_peak_anon_memory()
+    total_chars = 0
+
+    def counted_pages(pages):
+        nonlocal total_chars
+        for page_info in pages:
+            total_chars += len(page_info['text'])
+            yield page_info
+
     try:
         with open(pdf_path,"rb") as f :
             pdf_reader = PyPDF2.PdfReader(f)
             total_pages = len(pdf_reader.pages)
 
-            # Extract text from each page
-            page_texts = []
-            for page_num, page in enumerate(pdf_reader.pages):
-                print(f"   Reading page {page_num + 1}/{total_pages}...", end='\r')
-                page_text = page.extract_text()
-                page_texts.append({
-                    "text": page_text,
-                    "page_number": page_num + 1
-                })
-
-        # Combine all text
-        full_text = '\n'.join([p['text'] for p in page_texts])
-
-        print(f"\n✅ PDF read successfully!")
-        print(f"📊 Total pages: {total_pages}")
-        print(f"📊 Total characters: {len(full_text):,}")
-        print(f"📊 Average chars/page: {len(full_text) // total_pages:,}")
-
+            # Create chunks with better context preservation
+            chunk_iter = iter_chunks(counted_pages(iter_page_texts(pdf_reader)))
+            chunks, chunk_metadata, failed_chunks = stream_embeddings_to_disk(chunk_iter)
 
     except Exception as e:
-        print(f"❌ Error reading PDF: {str(e)}")
+        print(f"❌ Error reading PDF or writing embeddings: {str(e)}")
+        if os.path.exists(EMBEDDINGS_PATH):
+            os.remove(EMBEDDINGS_PATH)
+        stop_memory_tracking()
         return None, None
 
+    if not chunks:
+        print("❌ ERROR: No text chunks found in the PDF")
+        os.remove(EMBEDDINGS_PATH)
+        stop_memory_tracking()
+        return None, None
 
-    # Create chunks with better context preservation
-    chunks = []
-    chunk_metadata = []
-
-    # Smart chunking: preserve paragraphs when possible
-    for page_info in page_texts:
-        page_text = page_info['text']
-        page_num = page_info['page_number']
-
-        # Split page into chunks
-        for i in range(0,len(page_text),CHUNK_SIZE - CHUNK_OVERLAP):
-            chunk_text = page_text[i:i+CHUNK_SIZE]
-
-
-            if len(chunk_text.strip()) > 50:  # Skip very small chunks
-                chunks.append(chunk_text)
-                chunk_metadata.append({
-                    'page_number': page_num,
-                    'chunk_index': len(chunks) - 1,
-                    'char_start': i,
-                    'char_end': i + len(chunk_text)
-                })
+    print(f"\n✅ PDF read successfully!")
+    print(f"📊 Total pages: {total_pages}")
+    print(f"📊 Total characters: {total_chars:,}")
+    print(f"📊 Average chars/page: {total_chars // total_pages:,}")
 
     print(f"✅ Created {len(chunks)} chunks")
     print(f"📊 Average chunk size: {sum(len(c) for c in chunks) // len(chunks)} characters")
 
-
-    # Get embeddings from OpenAI
-    print(f"\n🔄 Generating embeddings using OpenAI ({EMBEDDING_MODEL})...")
-    print("⏳ This may take a few minutes...")
-
-    embeddings = []
-    failed_chunks = 0
-
-    for i,chunk in enumerate(chunks):
-        try:
-            print(f"   Processing chunk {i + 1}/{len(chunks)} ({(i + 1) / len(chunks) * 100:.1f}%)...", end='\r')
-
-            response = openai.Embedding.create(
-                input=chunk,
-                model =EMBEDDING_MODEL
-            )
-            embeddings.append(response['data'][0]['embedding'])
-
-        except Exception as e:
-            print(f"\n⚠️  Warning: Failed to embed chunk {i + 1}: {str(e)}")
-            failed_chunks +=1
-            # Use zero vector as placeholder
-            embeddings.append([0.0] * 1536)
-
     print(f"\n✅ Embeddings generated!")
 
     if failed_chunks > 0:
         print(f"⚠️  {failed_chunks} chunks failed to embed")
 
     # Create FAISS index
-    print(f"\n🗂️  Creating FAISS vector index...")
-    embeddings_array = np.array(embeddings).astype('float32')
+    print(f"\n🗂️  Creating FAISS vector index ({INDEX_TYPE})...")
 
-    # Normalize vectors for better similarity search
-    faiss.normalize_L2(embeddings_array)
+    try:
+        # Create index with inner product (cosine similarity for normalized vectors)
+        index = build_index(EMBEDDINGS_PATH, INDEX_TYPE)
 
-    # Create index with inner product (cosine similarity for normalized vectors)
-    index = faiss.IndexFlatIP(1536) # OpenAI embeddings are 1536 dimensions
-    index.add(embeddings_array)
+    finally:
+        # The vectors now live in the index; the chatbot never reads this file
+        os.remove(EMBEDDINGS_PATH)
 
     print(f"✅ FAISS index created with {index.ntotal} vectors")
 
@@ -159,42 +517,43 @@ def pdf_to_vectors(pdf_path):
 
     except Exception as e:
         print(f"❌ Error saving files: {str(e)}")
+        stop_memory_tracking()
         return None, None
 
+    peak_mb = peak_memory_mb()
+    peak_anon_mb = stop_memory_tracking()
+
     # Summary
     print("\n" + "=" * 70)
     print("🎉 VECTOR DATABASE CREATED SUCCESSFULLY!")
     print("=" * 70)
     print(f"📁 Files created:")
     print(f"   • {VECTOR_INDEX_PATH}")
+    if INDEX_TYPE == "ivf_ondisk":
+        print(f"   • {IVF_DATA_PATH}")
     print(f"   • {CHUNKS_PKL_PATH}")
     print(f"\n📊 Statistics:")
     print(f"   • Total pages processed: {total_pages}")
     print(f"   • Total chunks created: {len(chunks)}")
-    print(f"   • Vector dimensions: 1536")
+    print(f"   • Vector dimensions: {EMBEDDING_DIMENSION}")
     print(f"   • Index size: {index.ntotal} vectors")
     print(f"   • Average chunks per page: {len(chunks) / total_pages:.1f}")
+    if peak_mb is not None:
+        print(f"   • Peak memory (RSS): {peak_mb:.1f} MB")
+    if peak_anon_mb is not None:
+        print(f"   • Peak heap memory (RssAnon): {peak_anon_mb:.1f} MB")
     print("\n✅ You can now run 'rag_chatbot.py' to start chatting!")
     print("=" * 70)
 
-    return embeddings_array,chunks
+    return index,chunks
 
 
 if __name__ == "__main__":
     # Convert PDF to vectors
-    embeddings, chunks = pdf_to_vectors(PDF_PATH)
+    index, chunks = pdf_to_vectors(PDF_PATH)
 
-    if embeddings is not None:
+    if index is not None:
         print("\n✨ Setup complete!")
         print("▶️  Next step: Run 'rag_chatbot.py' to start the chatbot")
     else:
         print("\n❌ Setup failed. Please check the errors above.")
-
-
-
-
-
-
-
-
-